@@ -3,10 +3,10 @@ Unit test module for testing the AlignedDynamicTableContainer
 """
 import unittest
 import os
-import warnings
+from io import BytesIO
 
 import numpy as np
-from pynwb.testing import remove_test_file
+import h5py
 from pynwb import NWBHDF5IO
 from pandas.testing import assert_frame_equal
 
@@ -23,17 +23,47 @@ except ImportError:
     sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from ndx_icephys_meta.icephys import AlignedDynamicTable
 
+# Set the environment variable NDX_ICEPHYS_META_SKIP_IO_TESTS=1 to skip the tests that write/read HDF5 files
+SKIP_IO_TESTS = os.environ.get('NDX_ICEPHYS_META_SKIP_IO_TESTS', '0') == '1'
+
+# Read-only np.arange arrays shared as column data by all tests instead of allocating new arrays for each column
+_ARANGES = {n: np.arange(n) for n in (8, 10, 11)}
+for _arr in _ARANGES.values():
+    _arr.setflags(write=False)
+
 
 class TestAlignedDynamicTableContainer(unittest.TestCase):
     """
     Test the AlignedDynamicTable class.
     """
-    def setUp(self):
-        warnings.simplefilter("always")  # Trigger all warnings
-        self.path = 'test_icephys_meta_intracellularrecording.h5'
+    @classmethod
+    def setUpClass(cls):
+        # Settings for the default category tables shared by all tests
+        cls.category_names = ['test1', 'test2', 'test3']
+        cls.num_rows = 10
+        cls.column_data = _ARANGES[cls.num_rows]
+
+    @classmethod
+    def create_category_tables(cls, category_names=None, prefix_column_names=True):
+        """
+        Internal helper function to create a list of DynamicTables with columns 'c1', 'c2', 'c3'
+        that can be used as category tables for an AlignedDynamicTable.
 
-    def tearDown(self):
-        remove_test_file(self.path)
+        Adding a DynamicTable to an AlignedDynamicTable sets the parent of the table, so we need to
+        create new tables for every test, but the tables share the same cls.column_data array.
+
+        :param category_names: List of table names. If None then cls.category_names is used.
+        :param prefix_column_names: Prefix the name of the columns with the name of the table
+
+        :returns: List of DynamicTable objects with cls.num_rows rows each
+        """
+        category_names = cls.category_names if category_names is None else category_names
+        return [DynamicTable(name=val,
+                             description=val+" description",
+                             columns=[VectorData(name=(val+t) if prefix_column_names else t,
+                                                 description=val+t+' description',
+                                                 data=cls.column_data) for t in ['c1', 'c2', 'c3']]
+                             ) for val in category_names]
 
     def test_init(self):
         """Test that just checks that populating the tables with data works correctly"""
@@ -62,14 +92,8 @@ class TestAlignedDynamicTableContainer(unittest.TestCase):
 
     def test_init_category_table_names_do_not_match_categories(self):
         # Construct some categories for testing
-        category_names = ['test1', 'test2', 'test3']
-        num_rows = 10
-        categories = [DynamicTable(name=val,
-                                   description=val+" description",
-                                   columns=[VectorData(name=val+t,
-                                                       description=val+t+' description',
-                                                       data=np.arange(num_rows)) for t in ['c1', 'c2', 'c3']]
-                                   ) for val in category_names]
+        category_names = self.category_names
+        categories = self.create_category_tables(category_names=category_names)
         # Test add category_table that is not listed in the categories list
         with self.assertRaises(ValueError) as ve:
             AlignedDynamicTable(
@@ -82,12 +106,7 @@ class TestAlignedDynamicTableContainer(unittest.TestCase):
     def test_init_duplicate_category_table_name(self):
         # Test duplicate table name
         with self.assertRaises(ValueError) as ve:
-            categories = [DynamicTable(name=val,
-                                       description=val+" description",
-                                       columns=[VectorData(name=val+t,
-                                                           description=val+t+' description',
-                                                           data=np.arange(10)) for t in ['c1', 'c2', 'c3']]
-                                       ) for val in ['test1', 'test1', 'test3']]
+            categories = self.create_category_tables(category_names=['test1', 'test1', 'test3'])
             AlignedDynamicTable(
                 name='test_aligned_table',
                 description='Test aligned container',
@@ -98,17 +117,12 @@ class TestAlignedDynamicTableContainer(unittest.TestCase):
     def test_init_misaligned_category_tables(self):
         # Test misaligned category tables
         with self.assertRaises(ValueError) as ve:
-            categories = [DynamicTable(name=val,
-                                       description=val+" description",
-                                       columns=[VectorData(name=val+t,
-                                                           description=val+t+' description',
-                                                           data=np.arange(10)) for t in ['c1', 'c2', 'c3']]
-                                       ) for val in ['test1', 'test2']]
+            categories = self.create_category_tables(category_names=['test1', 'test2'])
             categories.append(DynamicTable(name='test3',
                                            description="test3 description",
                                            columns=[VectorData(name='test3 '+t,
                                                                description='test3 '+t+' description',
-                                                               data=np.arange(8)) for t in ['c1', 'c2', 'c3']]))
+                                                               data=_ARANGES[8]) for t in ['c1', 'c2', 'c3']]))
             AlignedDynamicTable(
                 name='test_aligned_table',
                 description='Test aligned container',
@@ -127,14 +141,8 @@ class TestAlignedDynamicTableContainer(unittest.TestCase):
 
     def test_init_with_custom_nonempty_categories(self):
         """Test that we can create an empty table with custom categories"""
-        category_names = ['test1', 'test2', 'test3']
-        num_rows = 10
-        categories = [DynamicTable(name=val,
-                                   description=val+" description",
-                                   columns=[VectorData(name=val+t,
-                                                       description=val+t+' description',
-                                                       data=np.arange(num_rows)) for t in ['c1', 'c2', 'c3']]
-                                   ) for val in category_names]
+        category_names = self.category_names
+        categories = self.create_category_tables(category_names=category_names)
         temp = AlignedDynamicTable(
             name='test_aligned_table',
             description='Test aligned container',
@@ -145,21 +153,15 @@ class TestAlignedDynamicTableContainer(unittest.TestCase):
         """
         Test that we can create a non-empty table with custom non-empty categories
         """
-        category_names = ['test1', 'test2', 'test3']
-        num_rows = 10
-        categories = [DynamicTable(name=val,
-                                   description=val+" description",
-                                   columns=[VectorData(name=t,
-                                                       description=val+t+' description',
-                                                       data=np.arange(num_rows)) for t in ['c1', 'c2', 'c3']]
-                                   ) for val in category_names]
+        category_names = self.category_names
+        categories = self.create_category_tables(category_names=category_names, prefix_column_names=False)
         temp = AlignedDynamicTable(
             name='test_aligned_table',
             description='Test aligned container',
             category_tables=categories,
             columns=[VectorData(name='main_' + t,
                                 description='main_'+t+'_description',
-                                data=np.arange(num_rows)) for t in ['c1', 'c2', 'c3']])
+                                data=self.column_data) for t in ['c1', 'c2', 'c3']])
 
         self.assertEqual(temp.categories, category_names)
         self.assertTrue('test1' in temp)  # test that contains category works
@@ -170,19 +172,18 @@ class TestAlignedDynamicTableContainer(unittest.TestCase):
 
     def test_init_with_custom_misaligned_categories(self):
         """Test that we cannot create an empty table with custom categories"""
-        num_rows = 10
         val1 = 'test1'
         val2 = 'test2'
         categories = [DynamicTable(name=val1,
                                    description=val1+" description",
                                    columns=[VectorData(name=val1+t,
                                                        description=val1+t+' description',
-                                                       data=np.arange(num_rows)) for t in ['c1', 'c2', 'c3']]),
+                                                       data=self.column_data) for t in ['c1', 'c2', 'c3']]),
                       DynamicTable(name=val1,
                                    description=val1+" description",
                                    columns=[VectorData(name=val2+t,
                                                        description=val2+t+' description',
-                                                       data=np.arange(num_rows+1)) for t in ['c1', 'c2', 'c3']])
+                                                       data=_ARANGES[11]) for t in ['c1', 'c2', 'c3']])
                       ]
         with self.assertRaises(ValueError):
             AlignedDynamicTable(
@@ -193,53 +194,39 @@ class TestAlignedDynamicTableContainer(unittest.TestCase):
     def test_init_with_duplicate_custom_categories(self):
         """Test that we can create an empty table with custom categories"""
         category_names = ['test1', 'test1']
-        num_rows = 10
-        categories = [DynamicTable(name=val,
-                                   description=val+" description",
-                                   columns=[VectorData(name=val+t,
-                                                       description=val+t+' description',
-                                                       data=np.arange(num_rows)) for t in ['c1', 'c2', 'c3']]
-                                   ) for val in category_names]
+        categories = self.create_category_tables(category_names=category_names)
         with self.assertRaises(ValueError):
             AlignedDynamicTable(
                 name='test_aligned_table',
                 description='Test aligned container',
                 category_tables=categories)
 
+    @unittest.skipIf(SKIP_IO_TESTS, "NDX_ICEPHYS_META_SKIP_IO_TESTS is set")
     def test_round_trip_container(self):
         """Test read and write the container by itself"""
-        category_names = ['test1', 'test2', 'test3']
-        num_rows = 10
-        categories = [DynamicTable(name=val,
-                                   description=val+" description",
-                                   columns=[VectorData(name=t,
-                                                       description=val+t+' description',
-                                                       data=np.arange(num_rows)) for t in ['c1', 'c2', 'c3']]
-                                   ) for val in category_names]
+        category_names = self.category_names
+        categories = self.create_category_tables(category_names=category_names, prefix_column_names=False)
         curr = AlignedDynamicTable(
             name='test_aligned_table',
             description='Test aligned container',
             category_tables=categories)
 
-        with NWBHDF5IO(self.path, 'w') as io:
-            io.write(curr)
-
-        with NWBHDF5IO(self.path, 'r') as io:
-            incon = io.read()
-            self.assertListEqual(incon.categories, curr.categories)
-            for n in category_names:
-                assert_frame_equal(incon[n], curr[n])
+        # Write the container to an HDF5 file held in memory by a BytesIO buffer. The writer is closed before
+        # we reopen the buffer for reading, and the read uses a new NWBHDF5IO (and BuildManager) so that the
+        # container is really constructed from the file.
+        with BytesIO() as buffer:
+            with h5py.File(buffer, 'w') as h5file, NWBHDF5IO(mode='w', file=h5file) as io:
+                io.write(curr)
+            with h5py.File(buffer, 'r') as h5file, NWBHDF5IO(mode='r', file=h5file) as io:
+                incon = io.read()
+                self.assertListEqual(incon.categories, curr.categories)
+                for n in category_names:
+                    assert_frame_equal(incon[n], curr[n])
 
     def test_add_category(self):
         """Test that we can correct a non-empty category to an existing table"""
-        category_names = ['test1', 'test2', 'test3']
-        num_rows = 10
-        categories = [DynamicTable(name=val,
-                                   description=val+" description",
-                                   columns=[VectorData(name=val+t,
-                                                       description=val+t+' description',
-                                                       data=np.arange(num_rows)) for t in ['c1', 'c2', 'c3']]
-                                   ) for val in category_names]
+        category_names = self.category_names
+        categories = self.create_category_tables(category_names=category_names)
         adt = AlignedDynamicTable(
             name='test_aligned_table',
             description='Test aligned container',
@@ -251,13 +238,7 @@ class TestAlignedDynamicTableContainer(unittest.TestCase):
     def test_add_category_misaligned_rows(self):
         """Test that we can correct a non-empty category to an existing table"""
         category_names = ['test1', 'test2']
-        num_rows = 10
-        categories = [DynamicTable(name=val,
-                                   description=val+" description",
-                                   columns=[VectorData(name=val+t,
-                                                       description=val+t+' description',
-                                                       data=np.arange(num_rows)) for t in ['c1', 'c2', 'c3']]
-                                   ) for val in category_names]
+        categories = self.create_category_tables(category_names=category_names)
         adt = AlignedDynamicTable(
             name='test_aligned_table',
             description='Test aligned container',
@@ -268,19 +249,13 @@ class TestAlignedDynamicTableContainer(unittest.TestCase):
                                           description='test3_description',
                                           columns=[VectorData(name='test3_'+t,
                                                               description='test3 '+t+' description',
-                                                              data=np.arange(num_rows - 2)) for t in ['c1', 'c2', 'c3']
-                                                   ]))
+                                                              data=_ARANGES[8])
+                                                   for t in ['c1', 'c2', 'c3']]))
         self.assertEqual(str(ve.exception), "New category DynamicTable does not align, it has 8 rows expected 10")
 
     def test_add_category_already_in_table(self):
         category_names = ['test1', 'test2', 'test2']
-        num_rows = 10
-        categories = [DynamicTable(name=val,
-                                   description=val+" description",
-                                   columns=[VectorData(name=val+t,
-                                                       description=val+t+' description',
-                                                       data=np.arange(num_rows)) for t in ['c1', 'c2', 'c3']]
-                                   ) for val in category_names]
+        categories = self.create_category_tables(category_names=category_names)
         adt = AlignedDynamicTable(
             name='test_aligned_table',
             description='Test aligned container',
@@ -296,9 +271,9 @@ class TestAlignedDynamicTableContainer(unittest.TestCase):
             description='Test aligned container',
             columns=[VectorData(name='test_'+t,
                                 description='test_'+t+' description',
-                                data=np.arange(10)) for t in ['c1', 'c2', 'c3']])
+                                data=self.column_data) for t in ['c1', 'c2', 'c3']])
         # Test successful add
-        adt.add_column(name='testA', description='testA', data=np.arange(10))
+        adt.add_column(name='testA', description='testA', data=self.column_data)
         self.assertTupleEqual(adt.colnames,  ('test_c1', 'test_c2', 'test_c3', 'testA'))
 
     def test_add_column_bad_category(self):
@@ -308,9 +283,9 @@ class TestAlignedDynamicTableContainer(unittest.TestCase):
             description='Test aligned container',
             columns=[VectorData(name='test_'+t,
                                 description='test_'+t+' description',
-                                data=np.arange(10)) for t in ['c1', 'c2', 'c3']])
+                                data=self.column_data) for t in ['c1', 'c2', 'c3']])
         with self.assertRaises(KeyError) as ke:
-            adt.add_column(category='mycat', name='testA', description='testA', data=np.arange(10))
+            adt.add_column(category='mycat', name='testA', description='testA', data=self.column_data)
         self.assertEqual(str(ke.exception), "'Category mycat not in table'")
 
     def test_add_column_bad_length(self):
@@ -320,40 +295,33 @@ class TestAlignedDynamicTableContainer(unittest.TestCase):
             description='Test aligned container',
             columns=[VectorData(name='test_'+t,
                                 description='test_'+t+' description',
-                                data=np.arange(10)) for t in ['c1', 'c2', 'c3']])
+                                data=self.column_data) for t in ['c1', 'c2', 'c3']])
         # Test successful add
         with self.assertRaises(ValueError) as ve:
-            adt.add_column(name='testA', description='testA', data=np.arange(8))
+            adt.add_column(name='testA', description='testA', data=_ARANGES[8])
         self.assertEqual(str(ve.exception), "column must have the same number of rows as 'id'")
 
     def test_add_column_to_subcategory(self):
         """Test adding a column to a subcategory"""
-        category_names = ['test1', 'test2', 'test3']
-        num_rows = 10
-        categories = [DynamicTable(name=val,
-                                   description=val+" description",
-                                   columns=[VectorData(name=val+t,
-                                                       description=val+t+' description',
-                                                       data=np.arange(num_rows)) for t in ['c1', 'c2', 'c3']]
-                                   ) for val in category_names]
+        category_names = self.category_names
+        categories = self.create_category_tables(category_names=category_names)
         adt = AlignedDynamicTable(
             name='test_aligned_table',
             description='Test aligned container',
             category_tables=categories)
         self.assertListEqual(adt.categories, category_names)
         # Test successful add
-        adt.add_column(category='test2', name='testA', description='testA', data=np.arange(10))
+        adt.add_column(category='test2', name='testA', description='testA', data=self.column_data)
         self.assertTupleEqual(adt.get_category('test2').colnames, ('test2c1', 'test2c2', 'test2c3', 'testA'))
 
     def test_add_row(self):
         """Test adding a row to a non_empty table"""
         category_names = ['test1', ]
-        num_rows = 10
         categories = [DynamicTable(name=val,
                                    description=val+" description",
                                    columns=[VectorData(name=t,
                                                        description=val+t+' description',
-                                                       data=np.arange(num_rows)) for t in ['c1', 'c2']]
+                                                       data=self.column_data) for t in ['c1', 'c2']]
                                    ) for val in category_names]
         temp = AlignedDynamicTable(
             name='test_aligned_table',
@@ -361,7 +329,7 @@ class TestAlignedDynamicTableContainer(unittest.TestCase):
             category_tables=categories,
             columns=[VectorData(name='main_' + t,
                                 description='main_'+t+'_description',
-                                data=np.arange(num_rows)) for t in ['c1', 'c2']])
+                                data=self.column_data) for t in ['c1', 'c2']])
         self.assertListEqual(temp.categories, category_names)
         # Test successful add
         temp.add_row(test1=dict(c1=1, c2=2), main_c1=3, main_c2=5)
@@ -421,21 +389,15 @@ class TestAlignedDynamicTableContainer(unittest.TestCase):
 
     def test_to_dataframe(self):
         """Test that the to_dataframe method works"""
-        category_names = ['test1', 'test2', 'test3']
-        num_rows = 10
-        categories = [DynamicTable(name=val,
-                                   description=val+" description",
-                                   columns=[VectorData(name=t,
-                                                       description=val+t+' description',
-                                                       data=np.arange(num_rows)) for t in ['c1', 'c2', 'c3']]
-                                   ) for val in category_names]
+        category_names = self.category_names
+        categories = self.create_category_tables(category_names=category_names, prefix_column_names=False)
         adt = AlignedDynamicTable(
             name='test_aligned_table',
             description='Test aligned container',
             category_tables=categories,
             columns=[VectorData(name='main_' + t,
                                 description='main_'+t+'_description',
-                                data=np.arange(num_rows)) for t in ['c1', 'c2', 'c3']])
+                                data=self.column_data) for t in ['c1', 'c2', 'c3']])
 
         # Test the to_dataframe method with default settings
         tdf = adt.to_dataframe()
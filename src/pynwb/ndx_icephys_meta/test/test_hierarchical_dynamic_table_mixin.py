@@ -26,6 +26,11 @@ except ImportError:
     sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from ndx_icephys_meta.icephys import HierarchicalDynamicTableMixin
 
+# Reference data file with the expected results of the to_denormalized_dataframe and to_hierarchical_dataframe tests
+_REF_FILENAME = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                             'referencedata_test_hierarchical_dynamic_table_mixin.h5')
+_REF_EXISTS = os.path.exists(_REF_FILENAME)
+
 
 class HierarchicalTableLevel(HierarchicalDynamicTableMixin, DynamicTable):
     """Test table class that references another table"""
@@ -60,47 +65,98 @@ class TestHierarchicalDynamicTableMixin(unittest.TestCase):
     class. The only time I/O becomes relevant is on read in case that, e.g., a
     h5py.Dataset may behave differently than a numpy array.
     """
-    def setUp(self):
-        self.table_level0 = DynamicTable(name='level0', description="level0 DynamicTable")
-        self.table_level1 = HierarchicalTableLevel(name='level1', child_table=self.table_level0)
-        self.table_level2 = HierarchicalTableLevel(name='level2', child_table=self.table_level1)
-
-    def tearDown(self):
-        del self.table_level0
-        del self.table_level1
-        del self.table_level2
-
-    def popolate_tables(self):
-        """Helper function to populate our tables generate in setUp with some simple data"""
-        self.table_level0.add_row(id=10)
-        self.table_level0.add_row(id=11)
-        self.table_level0.add_row(id=12)
-        self.table_level0.add_row(id=13)
-        self.table_level0.add_column(data=['tag1', 'tag2', 'tag2', 'tag1', 'tag3', 'tag4', 'tag5'],
-                                     name='tags',
-                                     description='custom tags',
-                                     index=[1, 2, 4, 7])
-        self.table_level0.add_column(data=np.arange(4),
-                                     name='myid',
-                                     description='custom ids',
-                                     index=False)
-        self.table_level1.add_row(id=0, child_table_refs=[0, 1])
-        self.table_level1.add_row(id=1, child_table_refs=[2])
-        self.table_level1.add_row(id=2, child_table_refs=[3])
-        self.table_level1.add_column(data=['tag1', 'tag2', 'tag2'],
-                                     name='tag',
-                                     description='custom tag',
-                                     index=False)
-        self.table_level1.add_column(data=['tag1', 'tag2', 'tag2', 'tag1', 'tag3', 'tag4', 'tag5'],
-                                     name='tags',
-                                     description='custom tags',
-                                     index=[2, 4, 7])
-        self.table_level2.add_row(id=0, child_table_refs=[0, ])
-        self.table_level2.add_row(id=1, child_table_refs=[1, 2])
-        self.table_level2.add_column(data=[10, 12],
-                                     name='filter',
-                                     description='filter value',
-                                     index=False)
+    # Keys of all reference DataFrames stored in the reference data file
+    reference_keys = ('test_to_denormalized_dataframe_table_level1',
+                      'test_to_denormalized_dataframe_table_level2',
+                      'test_to_denormalized_dataframe_flat_column_index_table_level1',
+                      'test_to_denormalized_dataframe_flat_column_index_table_level2',
+                      'test_to_hierarchical_dataframe_table_level1',
+                      'test_to_hierarchical_dataframe_table_level2',
+                      'test_to_hierarchical_dataframe_flat_column_index_table_level1',
+                      'test_to_hierarchical_dataframe_flat_column_index_table_level2')
+
+    # Reference DataFrames read by get_reference_data on first use
+    reference_data = None
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Create the populated tables shared by all tests. The tests must not modify the shared tables.
+        """
+        cls.table_level0, cls.table_level1, cls.table_level2 = cls.create_tables(populate=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls.table_level0
+        del cls.table_level1
+        del cls.table_level2
+        cls.reference_data = None
+
+    @classmethod
+    def get_reference_data(cls, key):
+        """
+        Helper function to get a reference DataFrame from the reference data file. All reference
+        DataFrames are read on the first call so that the tests do not have to reopen the file.
+
+        :param key: Key of the DataFrame in the reference data file
+        :type key: str
+
+        :returns: pandas.DataFrame with the expected results
+        """
+        if cls.reference_data is None:
+            with pandas.HDFStore(_REF_FILENAME, mode='r') as store:
+                cls.reference_data = {k: store[k] for k in cls.reference_keys}
+        return cls.reference_data[key]
+
+    @classmethod
+    def create_tables(cls, populate=True):
+        """
+        Helper function to create our hierarchy of tables
+
+        :param populate: Populate the tables with some simple data using popolate_tables
+        :type populate: bool
+
+        :returns: Tuple with the level0 DynamicTable and the level1 and level2 HierarchicalTableLevel
+        """
+        table_level0 = DynamicTable(name='level0', description="level0 DynamicTable")
+        table_level1 = HierarchicalTableLevel(name='level1', child_table=table_level0)
+        table_level2 = HierarchicalTableLevel(name='level2', child_table=table_level1)
+        if populate:
+            cls.popolate_tables(table_level0, table_level1, table_level2)
+        return table_level0, table_level1, table_level2
+
+    @staticmethod
+    def popolate_tables(table_level0, table_level1, table_level2):
+        """Helper function to populate the tables generated by create_tables with some simple data"""
+        table_level0.add_row(id=10)
+        table_level0.add_row(id=11)
+        table_level0.add_row(id=12)
+        table_level0.add_row(id=13)
+        table_level0.add_column(data=['tag1', 'tag2', 'tag2', 'tag1', 'tag3', 'tag4', 'tag5'],
+                                name='tags',
+                                description='custom tags',
+                                index=[1, 2, 4, 7])
+        table_level0.add_column(data=np.arange(4),
+                                name='myid',
+                                description='custom ids',
+                                index=False)
+        table_level1.add_row(id=0, child_table_refs=[0, 1])
+        table_level1.add_row(id=1, child_table_refs=[2])
+        table_level1.add_row(id=2, child_table_refs=[3])
+        table_level1.add_column(data=['tag1', 'tag2', 'tag2'],
+                                name='tag',
+                                description='custom tag',
+                                index=False)
+        table_level1.add_column(data=['tag1', 'tag2', 'tag2', 'tag1', 'tag3', 'tag4', 'tag5'],
+                                name='tags',
+                                description='custom tags',
+                                index=[2, 4, 7])
+        table_level2.add_row(id=0, child_table_refs=[0, ])
+        table_level2.add_row(id=1, child_table_refs=[1, 2])
+        table_level2.add_column(data=[10, 12],
+                                name='filter',
+                                description='filter value',
+                                index=False)
 
     @unittest.skip("Enable this test if you want to generate a new reference test data for comparison")
     def test_generate_reference_testdata(self):
@@ -110,9 +166,7 @@ class TestHierarchicalDynamicTableMixin(unittest.TestCase):
         to regenerate the reference results. CAUTION: We should confirm first that the
         functions produce the correct results.
         """
-        self.popolate_tables()
-        ref_filename = os.path.join(os.path.dirname(os.path.realpath(__file__)),
-                                    'referencedata_test_hierarchical_dynamic_table_mixin.h5')
+        ref_filename = _REF_FILENAME
         if os.path.exists(ref_filename):
             os.remove(ref_filename)
         print("\n Generating reference test data file %s" % ref_filename)
@@ -143,38 +197,36 @@ class TestHierarchicalDynamicTableMixin(unittest.TestCase):
 
     def test_populate_table_hierarchy(self):
         """Test that just checks that populating the tables with data works correctly"""
-        self.popolate_tables()
+        # Use our own tables to test the population of the tables independent of the shared tables
+        table_level0, table_level1, table_level2 = self.create_tables(populate=True)
         # Check level0 data
-        self.assertListEqual(self.table_level0.id[:], np.arange(10, 14, 1).tolist())
-        self.assertListEqual(self.table_level0['tags'][:],
+        np.testing.assert_array_equal(table_level0.id[:], np.arange(10, 14, 1))
+        self.assertListEqual(table_level0['tags'][:],
                              [['tag1'], ['tag2'], ['tag2', 'tag1'], ['tag3', 'tag4', 'tag5']])
-        self.assertListEqual(self.table_level0['myid'][:].tolist(), np.arange(0, 4, 1).tolist())
+        np.testing.assert_array_equal(table_level0['myid'][:], np.arange(0, 4, 1))
         # Check level1 data
-        self.assertListEqual(self.table_level1.id[:], np.arange(0, 3, 1).tolist())
-        self.assertListEqual(self.table_level1['tag'][:], ['tag1', 'tag2', 'tag2'])
-        self.assertTrue(self.table_level1['child_table_refs'].target.table is self.table_level0)
-        self.assertEqual(len(self.table_level1['child_table_refs'].target.table), 4)
+        np.testing.assert_array_equal(table_level1.id[:], np.arange(0, 3, 1))
+        self.assertListEqual(table_level1['tag'][:], ['tag1', 'tag2', 'tag2'])
+        self.assertTrue(table_level1['child_table_refs'].target.table is table_level0)
+        self.assertEqual(len(table_level1['child_table_refs'].target.table), 4)
         # Check level2 data
-        self.assertListEqual(self.table_level2.id[:], np.arange(0, 2, 1).tolist())
-        self.assertListEqual(self.table_level2['filter'][:], [10, 12])
-        self.assertTrue(self.table_level2['child_table_refs'].target.table is self.table_level1)
-        self.assertEqual(len(self.table_level2['child_table_refs'].target.table), 3)
+        np.testing.assert_array_equal(table_level2.id[:], np.arange(0, 2, 1))
+        self.assertListEqual(table_level2['filter'][:], [10, 12])
+        self.assertTrue(table_level2['child_table_refs'].target.table is table_level1)
+        self.assertEqual(len(table_level2['child_table_refs'].target.table), 3)
 
     def test_get_hierarchy_column_name(self):
         """Test the get_hiearchy_column_name function"""
-        self.popolate_tables()
         self.assertEqual(self.table_level1.get_hierarchy_column_name(), 'child_table_refs')
         self.assertEqual(self.table_level2.get_hierarchy_column_name(), 'child_table_refs')
 
     def test_get_referencing_column_names(self):
         """test the get_referencing_column_names function"""
-        self.popolate_tables()
         self.assertListEqual(self.table_level1.get_referencing_column_names(), ['child_table_refs'])
         self.assertListEqual(self.table_level2.get_referencing_column_names(), ['child_table_refs'])
 
     def test_get_targets(self):
         """test the get_targets function"""
-        self.popolate_tables()
         # test level 1
         temp = self.table_level1.get_targets()
         self.assertEqual(len(temp), 1)
@@ -185,46 +237,34 @@ class TestHierarchicalDynamicTableMixin(unittest.TestCase):
         self.assertTrue(temp[0] is self.table_level1)
         self.assertTrue(temp[1] is self.table_level0)
 
+    @unittest.skipUnless(_REF_EXISTS, "Reference data file not found required for test. %s" % _REF_FILENAME)
     def test_to_denormalized_dataframe(self):
         """
         Test to_denormalized_dataframe(flat_column_index=False)
         for self.table_level1 and self.table_level2
         """
-        ref_filename = os.path.join(os.path.dirname(os.path.realpath(__file__)),
-                                    'referencedata_test_hierarchical_dynamic_table_mixin.h5')
-        if not os.path.exists(ref_filename):
-            self.skipTest("Reference data file not found required for test. %s" & ref_filename)
-        self.popolate_tables()
         # level 1
         curr = self.table_level1.to_denormalized_dataframe(flat_column_index=False)
-        ref = pandas.read_hdf(path_or_buf=ref_filename,
-                              key='test_to_denormalized_dataframe_table_level1')
+        ref = self.get_reference_data('test_to_denormalized_dataframe_table_level1')
         pandas.testing.assert_frame_equal(curr, ref)
         # level 2
         curr = self.table_level2.to_denormalized_dataframe(flat_column_index=False)
-        ref = pandas.read_hdf(path_or_buf=ref_filename,
-                              key='test_to_denormalized_dataframe_table_level2')
+        ref = self.get_reference_data('test_to_denormalized_dataframe_table_level2')
         pandas.testing.assert_frame_equal(curr, ref)
 
+    @unittest.skipUnless(_REF_EXISTS, "Reference data file not found required for test. %s" % _REF_FILENAME)
     def test_to_denormalized_dataframe_flat_column_index(self):
         """
         Test to_denormalized_dataframe(flat_column_index=True)
         for self.table_level1 and self.table_level2
         """
-        ref_filename = os.path.join(os.path.dirname(os.path.realpath(__file__)),
-                                    'referencedata_test_hierarchical_dynamic_table_mixin.h5')
-        if not os.path.exists(ref_filename):
-            self.skipTest("Reference data file not found required for test. %s" & ref_filename)
-        self.popolate_tables()
         # test level 1
         curr = self.table_level1.to_denormalized_dataframe(flat_column_index=True)
-        ref = pandas.read_hdf(path_or_buf=ref_filename,
-                              key='test_to_denormalized_dataframe_flat_column_index_table_level1')
+        ref = self.get_reference_data('test_to_denormalized_dataframe_flat_column_index_table_level1')
         pandas.testing.assert_frame_equal(curr, ref)
         # test level 2
         curr = self.table_level2.to_denormalized_dataframe(flat_column_index=True)
-        ref = pandas.read_hdf(path_or_buf=ref_filename,
-                              key='test_to_denormalized_dataframe_flat_column_index_table_level2')
+        ref = self.get_reference_data('test_to_denormalized_dataframe_flat_column_index_table_level2')
         pandas.testing.assert_frame_equal(curr, ref)
 
     def test_to_hierarchical_dataframe_empty_table(self):
@@ -232,61 +272,50 @@ class TestHierarchicalDynamicTableMixin(unittest.TestCase):
         Test creating the hierarchical table that is empty
         """
         # Do not populate with data, just straight convert to dataframe
-        tab = self.table_level1.to_hierarchical_dataframe()
+        _, table_level1, table_level2 = self.create_tables(populate=False)
+        tab = table_level1.to_hierarchical_dataframe()
         self.assertEqual(len(tab), 0)
         self.assertListEqual(tab.columns.to_list(), [('level0', 'id')])
         self.assertListEqual(tab.index.names, [('level1', 'id')])
-        tab = self.table_level2.to_hierarchical_dataframe()
+        tab = table_level2.to_hierarchical_dataframe()
         self.assertEqual(len(tab), 0)
         self.assertListEqual(tab.columns.to_list(), [('level0', 'id')])
         self.assertListEqual(tab.index.names, [('level2', 'id'), ('level1', 'id')])
-        tab = self.table_level1.to_hierarchical_dataframe(flat_column_index=True)
+        tab = table_level1.to_hierarchical_dataframe(flat_column_index=True)
         self.assertEqual(len(tab), 0)
         self.assertListEqual(tab.columns.to_list(), [('level0', 'id')])
-        tab = self.table_level2.to_hierarchical_dataframe(flat_column_index=True)
+        tab = table_level2.to_hierarchical_dataframe(flat_column_index=True)
         self.assertListEqual(tab.columns.to_list(), [('level0', 'id')])
         self.assertListEqual(tab.index.names, [('level2', 'id'), ('level1', 'id')])
 
+    @unittest.skipUnless(_REF_EXISTS, "Reference data file not found required for test. %s" % _REF_FILENAME)
     def test_to_hierarchical_dataframe(self):
         """
         Test to_hierarchical_dataframe(flat_column_index=False)
         for self.table_level1 and self.table_level2
         """
-        ref_filename = os.path.join(os.path.dirname(os.path.realpath(__file__)),
-                                    'referencedata_test_hierarchical_dynamic_table_mixin.h5')
-        if not os.path.exists(ref_filename):
-            self.skipTest("Reference data file not found required for test. %s" & ref_filename)
-        self.popolate_tables()
         # test level 1
         curr = self.table_level1.to_hierarchical_dataframe(flat_column_index=False)
-        ref = pandas.read_hdf(path_or_buf=ref_filename,
-                              key='test_to_hierarchical_dataframe_table_level1')
+        ref = self.get_reference_data('test_to_hierarchical_dataframe_table_level1')
         pandas.testing.assert_frame_equal(curr, ref)
         # test level 2
         curr = self.table_level2.to_hierarchical_dataframe(flat_column_index=False)
-        ref = pandas.read_hdf(path_or_buf=ref_filename,
-                              key='test_to_hierarchical_dataframe_table_level2')
+        ref = self.get_reference_data('test_to_hierarchical_dataframe_table_level2')
         pandas.testing.assert_frame_equal(curr, ref)
 
+    @unittest.skipUnless(_REF_EXISTS, "Reference data file not found required for test. %s" % _REF_FILENAME)
     def test_to_hierarchical_dataframe_flat_column_index(self):
         """
         Test to_hierarchical_dataframe(flat_column_index=True)
         for self.table_level1 and self.table_level2
         """
-        ref_filename = os.path.join(os.path.dirname(os.path.realpath(__file__)),
-                                    'referencedata_test_hierarchical_dynamic_table_mixin.h5')
-        if not os.path.exists(ref_filename):
-            self.skipTest("Reference data file not found required for test. %s" & ref_filename)
-        self.popolate_tables()
         # test level 1
         curr = self.table_level1.to_hierarchical_dataframe(flat_column_index=True)
-        ref = pandas.read_hdf(path_or_buf=ref_filename,
-                              key='test_to_hierarchical_dataframe_flat_column_index_table_level1')
+        ref = self.get_reference_data('test_to_hierarchical_dataframe_flat_column_index_table_level1')
         pandas.testing.assert_frame_equal(curr, ref)
         # test level 2
         curr = self.table_level2.to_hierarchical_dataframe(flat_column_index=True)
-        ref = pandas.read_hdf(path_or_buf=ref_filename,
-                              key='test_to_hierarchical_dataframe_flat_column_index_table_level2')
+        ref = self.get_reference_data('test_to_hierarchical_dataframe_flat_column_index_table_level2')
         pandas.testing.assert_frame_equal(curr, ref)
 
 
@@ -1,11 +1,13 @@
 import unittest
 import warnings
+import os
+from io import BytesIO
 import numpy as np
 from datetime import datetime
-from dateutil.tz import tzlocal
+from dateutil.tz import tzutc
 import h5py
-from pynwb.icephys import VoltageClampStimulusSeries, VoltageClampSeries, CurrentClampStimulusSeries, IZeroClampSeries
-from pynwb.testing import remove_test_file
+from pynwb.icephys import (VoltageClampStimulusSeries, VoltageClampSeries, CurrentClampStimulusSeries, IZeroClampSeries,
+                           SweepTable)
 from pynwb import NWBHDF5IO
 from hdmf.utils import docval, popargs
 from pandas.testing import assert_frame_equal
@@ -19,7 +21,6 @@ try:
                                           ICEphysFile)
 except ImportError:
     # If we are running tests directly in the GitHub repo without installing the extension
-    import os
     import sys
     sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from ndx_icephys_meta.icephys import (IntracellularRecordingsTable,
@@ -29,6 +30,20 @@ except ImportError:
                                           ExperimentalConditionsTable,
                                           ICEphysFile)
 
+# Set the environment variable NDX_ICEPHYS_META_SKIP_IO_TESTS=1 to skip the tests that write/read HDF5 files
+SKIP_IO_TESTS = os.environ.get('NDX_ICEPHYS_META_SKIP_IO_TESTS', '0') == '1'
+
+# Read-only stimulus and response data shared by all test series instead of creating new lists for each series
+_STIMULUS_DATA = np.array([1, 2, 3, 4, 5])
+_RESPONSE_DATA = np.array([0.1, 0.2, 0.3, 0.4, 0.5])
+_STIMULUS_DATA.setflags(write=False)
+_RESPONSE_DATA.setflags(write=False)
+# Sweep number of the stimulus/response series used by the tests
+_SWEEP_NUMBER = np.uint64(15)
+
+# Fixed session start time for all test files. The actual time is irrelevant for the tests
+_SESSION_START_TIME = datetime(2020, 1, 1, tzinfo=tzutc())
+
 # TODO Add simple round-trip tests for all classes (i.e., test_round_trip_container_no_data tests without NWBFile)
 # TODO Add tests for adding custom categories (both on init and using add_category)
 # TODO Add test provide category tables for IntracellularRecording on init to test error checks for bad/missing tables
@@ -57,7 +72,7 @@ class ICEphysMetaTestBase(unittest.TestCase):
         """
         stimulus = VoltageClampStimulusSeries(
                     name="ccss_"+str(sweep_number),
-                    data=[1, 2, 3, 4, 5] if not randomize_data else np.random.rand(10),
+                    data=_STIMULUS_DATA if not randomize_data else np.random.rand(10),
                     starting_time=123.6 if not randomize_data else (np.random.rand() * 100),
                     rate=10e3 if not randomize_data else int(np.random.rand()*10) * 1000 + 1000.,
                     electrode=electrode,
@@ -66,7 +81,7 @@ class ICEphysMetaTestBase(unittest.TestCase):
         # Create and ic-response
         response = VoltageClampSeries(
                     name='vcs_'+str(sweep_number),
-                    data=[0.1, 0.2, 0.3, 0.4, 0.5] if not randomize_data else np.random.rand(10),
+                    data=_RESPONSE_DATA if not randomize_data else np.random.rand(10),
                     conversion=1e-12,
                     resolution=np.nan,
                     starting_time=123.6 if not randomize_data else (np.random.rand() * 100),
@@ -98,7 +113,7 @@ class ICEphysMetaTestBase(unittest.TestCase):
         nwbfile = ICEphysFile(
                 session_description='my first synthetic recording',
                 identifier='EXAMPLE_ID',
-                session_start_time=datetime.now(tzlocal()),
+                session_start_time=_SESSION_START_TIME,
                 experimenter='Dr. Bilbo Baggins',
                 lab='Bag End Laboratory',
                 institution='University of Middle Earth at the Shire',
@@ -209,7 +224,7 @@ class ICEphysMetaTestBase(unittest.TestCase):
         self.nwbfile = ICEphysFile(
             session_description='my first synthetic recording',
             identifier='EXAMPLE_ID',
-            session_start_time=datetime.now(tzlocal()),
+            session_start_time=_SESSION_START_TIME,
             experimenter='Dr. Bilbo Baggins',
             lab='Bag End Laboratory',
             institution='University of Middle Earth at the Shire',
@@ -220,15 +235,15 @@ class ICEphysMetaTestBase(unittest.TestCase):
                                                                description='a mock intracellular electrode',
                                                                device=self.device)
         self.stimulus = VoltageClampStimulusSeries(name="ccss",
-                                                   data=[1, 2, 3, 4, 5],
+                                                   data=_STIMULUS_DATA,
                                                    starting_time=123.6,
                                                    rate=10e3,
                                                    electrode=self.electrode,
                                                    gain=0.02,
-                                                   sweep_number=np.uint64(15))
+                                                   sweep_number=_SWEEP_NUMBER)
         self.nwbfile.add_stimulus(self.stimulus)
         self.response = VoltageClampSeries(name='vcs',
-                                           data=[0.1, 0.2, 0.3, 0.4, 0.5],
+                                           data=_RESPONSE_DATA,
                                            conversion=1e-12,
                                            resolution=np.nan,
                                            starting_time=123.6,
@@ -237,12 +252,45 @@ class ICEphysMetaTestBase(unittest.TestCase):
                                            gain=0.02,
                                            capacitance_slow=100e-12,
                                            resistance_comp_correction=70.0,
-                                           sweep_number=np.uint64(15))
+                                           sweep_number=_SWEEP_NUMBER)
         self.nwbfile.add_acquisition(self.response)
-        self.path = 'test_icephys_meta_intracellularrecording.h5'
 
-    def tearDown(self):
-        remove_test_file(self.path)
+    def create_table_hierarchy(self, num_tables):
+        """
+        Internal helper function to create the hierarchy of icephys metadata tables with one row per table, where
+        the row of each table references the first row of the table one level down. The helper also checks the
+        row index returned when adding each row.
+
+        :param num_tables: Number of tables to create, from 1 (only the IntracellularRecordingsTable) to 4
+                           (up to the RepetitionsTable)
+        :type num_tables: int
+
+        :returns: List with the tables ordered from the IntracellularRecordingsTable up
+        """
+        ir = IntracellularRecordingsTable()
+        row_index = ir.add_recording(electrode=self.electrode,
+                                     stimulus=self.stimulus,
+                                     response=self.response,
+                                     id=np.int64(10))
+        self.assertEqual(row_index, 0)
+        self.assertEqual(len(ir), 1)
+        tables = [ir]
+        if num_tables > 1:
+            sw = SimultaneousRecordingsTable(intracellular_recordings_table=ir)
+            row_index = sw.add_simultaneous_recording(recordings=[0])
+            self.assertEqual(row_index, 0)
+            tables.append(sw)
+        if num_tables > 2:
+            sws = SequentialRecordingsTable(sw)
+            row_index = sws.add_sequential_recording(simultaneous_recordings=[0, ], stimulus_type='MyStimStype')
+            self.assertEqual(row_index, 0)
+            tables.append(sws)
+        if num_tables > 3:
+            repetitions = RepetitionsTable(sequential_recordings_table=sws)
+            row_index = repetitions.add_repetition(sequential_recordings=[0, ])
+            self.assertEqual(row_index, 0)
+            tables.append(repetitions)
+        return tables
 
     @docval({'name': 'ir',
              'type': IntracellularRecordingsTable,
@@ -279,46 +327,53 @@ class ICEphysMetaTestBase(unittest.TestCase):
         if cond is not None:
             self.nwbfile.icephys_experimental_conditions = cond
 
-        # Write our test file
-        with NWBHDF5IO(self.path, 'w') as io:
-            io.write(self.nwbfile)
-
-        # Test that we can read the file
-        with NWBHDF5IO(self.path, 'r') as io:
-            infile = io.read()
-            if ir is not None:
-                in_ir = infile.intracellular_recordings
-                self.assertIsNotNone(in_ir)
-                to_dataframe_kwargs = dict(electrode_refs_as_objectids=True,
-                                           stimulus_refs_as_objectids=True,
-                                           response_refs_as_objectids=True)
-                assert_frame_equal(ir.to_dataframe(**to_dataframe_kwargs), in_ir.to_dataframe(**to_dataframe_kwargs))
-            if sw is not None:
-                in_sw = infile.icephys_simultaneous_recordings
-                self.assertIsNotNone(in_sw)
-                self.assertListEqual(in_sw['recordings'].target.data[:].tolist(), sw['recordings'].target.data[:])
-                self.assertEqual(in_sw['recordings'].target.table.object_id, sw['recordings'].target.table.object_id)
-            if sws is not None:
-                in_sws = infile.icephys_sequential_recordings
-                self.assertIsNotNone(in_sws)
-                self.assertListEqual(in_sws['simultaneous_recordings'].target.data[:].tolist(),
-                                     sws['simultaneous_recordings'].target.data[:])
-                self.assertEqual(in_sws['simultaneous_recordings'].target.table.object_id,
-                                 sws['simultaneous_recordings'].target.table.object_id)
-            if repetitions is not None:
-                in_repetitions = infile.icephys_repetitions
-                self.assertIsNotNone(in_repetitions)
-                self.assertListEqual(in_repetitions['sequential_recordings'].target.data[:].tolist(),
-                                     repetitions['sequential_recordings'].target.data[:])
-                self.assertEqual(in_repetitions['sequential_recordings'].target.table.object_id,
-                                 repetitions['sequential_recordings'].target.table.object_id)
-            if cond is not None:
-                in_cond = infile.icephys_experimental_conditions
-                self.assertIsNotNone(in_cond)
-                self.assertListEqual(in_cond['repetitions'].target.data[:].tolist(),
-                                     cond['repetitions'].target.data[:])
-                self.assertEqual(in_cond['repetitions'].target.table.object_id,
-                                 cond['repetitions'].target.table.object_id)
+        # The tables have been checked in memory by the caller. Skip only the HDF5 round trip
+        if SKIP_IO_TESTS:
+            return
+
+        # Write our test file to an HDF5 file held in memory by a BytesIO buffer and close the writer
+        # before we reopen the buffer for reading
+        with BytesIO() as buffer:
+            with h5py.File(buffer, 'w') as h5file, NWBHDF5IO(mode='w', file=h5file) as io:
+                io.write(self.nwbfile)
+            # Test that we can read the file
+            with h5py.File(buffer, 'r') as h5file, NWBHDF5IO(mode='r', file=h5file) as io:
+                infile = io.read()
+                if ir is not None:
+                    in_ir = infile.intracellular_recordings
+                    self.assertIsNotNone(in_ir)
+                    to_dataframe_kwargs = dict(electrode_refs_as_objectids=True,
+                                               stimulus_refs_as_objectids=True,
+                                               response_refs_as_objectids=True)
+                    assert_frame_equal(ir.to_dataframe(**to_dataframe_kwargs),
+                                       in_ir.to_dataframe(**to_dataframe_kwargs))
+                if sw is not None:
+                    in_sw = infile.icephys_simultaneous_recordings
+                    self.assertIsNotNone(in_sw)
+                    np.testing.assert_array_equal(in_sw['recordings'].target.data[:], sw['recordings'].target.data[:])
+                    self.assertEqual(in_sw['recordings'].target.table.object_id,
+                                     sw['recordings'].target.table.object_id)
+                if sws is not None:
+                    in_sws = infile.icephys_sequential_recordings
+                    self.assertIsNotNone(in_sws)
+                    np.testing.assert_array_equal(in_sws['simultaneous_recordings'].target.data[:],
+                                                  sws['simultaneous_recordings'].target.data[:])
+                    self.assertEqual(in_sws['simultaneous_recordings'].target.table.object_id,
+                                     sws['simultaneous_recordings'].target.table.object_id)
+                if repetitions is not None:
+                    in_repetitions = infile.icephys_repetitions
+                    self.assertIsNotNone(in_repetitions)
+                    np.testing.assert_array_equal(in_repetitions['sequential_recordings'].target.data[:],
+                                                  repetitions['sequential_recordings'].target.data[:])
+                    self.assertEqual(in_repetitions['sequential_recordings'].target.table.object_id,
+                                     repetitions['sequential_recordings'].target.table.object_id)
+                if cond is not None:
+                    in_cond = infile.icephys_experimental_conditions
+                    self.assertIsNotNone(in_cond)
+                    np.testing.assert_array_equal(in_cond['repetitions'].target.data[:],
+                                                  cond['repetitions'].target.data[:])
+                    self.assertEqual(in_cond['repetitions'].target.table.object_id,
+                                     cond['repetitions'].target.table.object_id)
 
 
 class IntracellularElectrodesTableTests(unittest.TestCase):
@@ -396,7 +451,7 @@ class IntracellularRecordingsTableTests(ICEphysMetaTestBase):
         sweep_number = 15
         local_stimulus = CurrentClampStimulusSeries(
             name="ccss_"+str(sweep_number),
-            data=[1, 2, 3, 4, 5],
+            data=_STIMULUS_DATA,
             starting_time=123.6,
             rate=10e3,
             electrode=self.electrode,
@@ -412,7 +467,7 @@ class IntracellularRecordingsTableTests(ICEphysMetaTestBase):
     def test_warn_if_IZeroClampSeries_with_stimulus(self):
         local_response = IZeroClampSeries(
             name="ccss",
-            data=[1, 2, 3, 4, 5],
+            data=_STIMULUS_DATA,
             starting_time=123.6,
             rate=10e3,
             electrode=self.electrode,
@@ -430,7 +485,7 @@ class IntracellularRecordingsTableTests(ICEphysMetaTestBase):
                                                                 description='a mock intracellular electrode',
                                                                 device=self.device)
         local_stimulus = VoltageClampStimulusSeries(name="ccss",
-                                                    data=[1, 2, 3, 4, 5],
+                                                    data=_STIMULUS_DATA,
                                                     starting_time=123.6,
                                                     rate=10e3,
                                                     electrode=local_electrode,
@@ -486,54 +541,27 @@ class IntracellularRecordingsTableTests(ICEphysMetaTestBase):
         self.write_test_helper(ir)
 
     def test_add_row_index_out_of_range(self):
-
-        # Stimulus/Response start_index to large
-        with self.assertRaises(IndexError):
-            ir = IntracellularRecordingsTable()
-            ir.add_recording(electrode=self.electrode,
-                             stimulus=self.stimulus,
-                             stimulus_start_index=10,
-                             response=self.response,
-                             id=np.int64(10))
-        with self.assertRaises(IndexError):
-            ir = IntracellularRecordingsTable()
-            ir.add_recording(electrode=self.electrode,
-                             stimulus=self.stimulus,
-                             response_start_index=10,
-                             response=self.response,
-                             id=np.int64(10))
-        # Stimulus/Reponse index count too large
-        with self.assertRaises(IndexError):
-            ir = IntracellularRecordingsTable()
-            ir.add_recording(electrode=self.electrode,
-                             stimulus=self.stimulus,
-                             stimulus_index_count=10,
-                             response=self.response,
-                             id=np.int64(10))
-        with self.assertRaises(IndexError):
-            ir = IntracellularRecordingsTable()
-            ir.add_recording(electrode=self.electrode,
-                             stimulus=self.stimulus,
-                             response_index_count=10,
-                             response=self.response,
-                             id=np.int64(10))
-        # Stimulus/Reponse start+count combination too large
-        with self.assertRaises(IndexError):
-            ir = IntracellularRecordingsTable()
-            ir.add_recording(electrode=self.electrode,
-                             stimulus=self.stimulus,
-                             stimulus_start_index=3,
-                             stimulus_index_count=4,
-                             response=self.response,
-                             id=np.int64(10))
-        with self.assertRaises(IndexError):
-            ir = IntracellularRecordingsTable()
-            ir.add_recording(electrode=self.electrode,
-                             stimulus=self.stimulus,
-                             response_start_index=3,
-                             response_index_count=4,
-                             response=self.response,
-                             id=np.int64(10))
+        bad_index_cases = (
+            # Stimulus/Response start_index to large
+            dict(stimulus_start_index=10),
+            dict(response_start_index=10),
+            # Stimulus/Reponse index count too large
+            dict(stimulus_index_count=10),
+            dict(response_index_count=10),
+            # Stimulus/Reponse start+count combination too large
+            dict(stimulus_start_index=3, stimulus_index_count=4),
+            dict(response_start_index=3, response_index_count=4))
+        # add_recording checks the indices before adding the row, so all cases can share the same table
+        ir = IntracellularRecordingsTable()
+        for case in bad_index_cases:
+            with self.subTest(**case):
+                with self.assertRaises(IndexError):
+                    ir.add_recording(electrode=self.electrode,
+                                     stimulus=self.stimulus,
+                                     response=self.response,
+                                     id=np.int64(10),
+                                     **case)
+        self.assertEqual(len(ir), 0)
 
     def test_add_row_no_stimulus_and_response(self):
         with self.assertRaises(ValueError):
@@ -579,17 +607,20 @@ class IntracellularRecordingsTableTests(ICEphysMetaTestBase):
         ir.add_column(name='test', description='test column', data=np.arange(1))
         self.write_test_helper(ir=ir)
 
+    @unittest.skipIf(SKIP_IO_TESTS, "NDX_ICEPHYS_META_SKIP_IO_TESTS is set")
     def test_round_trip_container_no_data(self):
         """Test read and write the container by itself"""
         curr = IntracellularRecordingsTable()
-        with NWBHDF5IO(self.path, 'w') as io:
-            io.write(curr)
-        with NWBHDF5IO(self.path, 'r') as io:
-            incon = io.read()
-            self.assertListEqual(incon.categories, curr.categories)
-            for n in curr.categories:
-                # empty columns from file have dtype int64 or float64 but empty in-memory columns have dtype object
-                assert_frame_equal(incon[n], curr[n], check_dtype=False, check_index_type=False)
+        # Write and read the container in memory (see write_test_helper)
+        with BytesIO() as buffer:
+            with h5py.File(buffer, 'w') as h5file, NWBHDF5IO(mode='w', file=h5file) as io:
+                io.write(curr)
+            with h5py.File(buffer, 'r') as h5file, NWBHDF5IO(mode='r', file=h5file) as io:
+                incon = io.read()
+                self.assertListEqual(incon.categories, curr.categories)
+                for n in curr.categories:
+                    # empty columns from file have dtype int64 or float64 but empty in-memory columns have dtype object
+                    assert_frame_equal(incon[n], curr[n], check_dtype=False, check_index_type=False)
 
     def test_write_with_stimulus_template(self):
         """
@@ -598,7 +629,7 @@ class IntracellularRecordingsTableTests(ICEphysMetaTestBase):
         local_nwbfile = ICEphysFile(
                 session_description='my first synthetic recording',
                 identifier='EXAMPLE_ID',
-                session_start_time=datetime.now(tzlocal()),
+                session_start_time=_SESSION_START_TIME,
                 experimenter='Dr. Bilbo Baggins',
                 lab='Bag End Laboratory',
                 institution='University of Middle Earth at the Shire',
@@ -611,14 +642,14 @@ class IntracellularRecordingsTableTests(ICEphysMetaTestBase):
             description='a mock intracellular electrode',
             device=local_device)
         local_stimulus = VoltageClampStimulusSeries(name="ccss",
-                                                    data=[1, 2, 3, 4, 5],
+                                                    data=_STIMULUS_DATA,
                                                     starting_time=123.6,
                                                     rate=10e3,
                                                     electrode=local_electrode,
                                                     gain=0.02,
-                                                    sweep_number=np.uint64(15))
+                                                    sweep_number=_SWEEP_NUMBER)
         local_response = VoltageClampSeries(name='vcs',
-                                            data=[0.1, 0.2, 0.3, 0.4, 0.5],
+                                            data=_RESPONSE_DATA,
                                             conversion=1e-12,
                                             resolution=np.nan,
                                             starting_time=123.6,
@@ -627,16 +658,20 @@ class IntracellularRecordingsTableTests(ICEphysMetaTestBase):
                                             gain=0.02,
                                             capacitance_slow=100e-12,
                                             resistance_comp_correction=70.0,
-                                            sweep_number=np.uint64(15))
+                                            sweep_number=_SWEEP_NUMBER)
         local_nwbfile.add_stimulus_template(local_stimulus)
         row_index = local_nwbfile.add_intracellular_recording(electrode=local_electrode,
                                                               stimulus=local_stimulus,
                                                               response=local_response,
                                                               id=np.int64(10))
         self.assertEqual(row_index, 0)
-        # Write our test file
-        with NWBHDF5IO(self.path, 'w') as io:
-            io.write(local_nwbfile)
+        # The file has been checked in memory above. Skip only the HDF5 write
+        if SKIP_IO_TESTS:
+            return
+        # Write our test file to an HDF5 file held in memory by a BytesIO buffer
+        with BytesIO() as buffer:
+            with h5py.File(buffer, 'w') as h5file, NWBHDF5IO(mode='w', file=h5file) as io:
+                io.write(local_nwbfile)
 
 
 class SimultaneousRecordingsTableTests(ICEphysMetaTestBase):
@@ -675,35 +710,25 @@ class SimultaneousRecordingsTableTests(ICEphysMetaTestBase):
         sw = SimultaneousRecordingsTable(intracellular_recordings_table=ir)
         row_index = sw.add_simultaneous_recording(recordings=[row_index], id=100)
         self.assertEqual(row_index, 0)
-        self.assertListEqual(sw.id[:], [100])
-        self.assertListEqual(sw['recordings'].data, [1])
-        self.assertListEqual(sw['recordings'].target.data[:], [0])
+        np.testing.assert_array_equal(sw.id[:], [100])
+        np.testing.assert_array_equal(sw['recordings'].data, [1])
+        np.testing.assert_array_equal(sw['recordings'].target.data[:], [0])
 
     def test_basic_write(self):
         """
         Populate, write, and read the SimultaneousRecordingsTable container and other required containers
         """
-        ir = IntracellularRecordingsTable()
-        row_index = ir.add_recording(electrode=self.electrode,
-                                     stimulus=self.stimulus,
-                                     response=self.response,
-                                     id=np.int64(10))
-        self.assertEqual(row_index, 0)
-        self.assertEqual(len(ir), 1)
+        ir, = self.create_table_hierarchy(1)
         sw = SimultaneousRecordingsTable(intracellular_recordings_table=ir)
-        row_index = sw.add_simultaneous_recording(recordings=[row_index])
+        row_index = sw.add_simultaneous_recording(recordings=[0])
         self.assertEqual(row_index, 0)
         self.write_test_helper(ir=ir, sw=sw)
 
     def test_enforce_unique_id(self):
         """
-        Test to ensure that unique ids are enforced on RepetitionsTable table
+        Test to ensure that unique ids are enforced on SimultaneousRecordingsTable table
         """
-        ir = IntracellularRecordingsTable()
-        ir.add_recording(electrode=self.electrode,
-                         stimulus=self.stimulus,
-                         response=self.response,
-                         id=np.int64(10))
+        ir, = self.create_table_hierarchy(1)
         sw = SimultaneousRecordingsTable(intracellular_recordings_table=ir)
         sw.add_simultaneous_recording(recordings=[0], id=np.int64(10))
         with self.assertRaises(ValueError):
@@ -737,15 +762,7 @@ class SequentialRecordingsTableTests(ICEphysMetaTestBase):
         """
         Populate, write, and read the SequentialRecordingsTable container and other required containers
         """
-        ir = IntracellularRecordingsTable()
-        row_index = ir.add_recording(electrode=self.electrode,
-                                     stimulus=self.stimulus,
-                                     response=self.response,
-                                     id=np.int64(10))
-        self.assertEqual(row_index, 0)
-        sw = SimultaneousRecordingsTable(intracellular_recordings_table=ir)
-        row_index = sw.add_simultaneous_recording(recordings=[0])
-        self.assertEqual(row_index, 0)
+        ir, sw = self.create_table_hierarchy(2)
         sws = SequentialRecordingsTable(sw)
         row_index = sws.add_sequential_recording(simultaneous_recordings=[0, ], stimulus_type='MyStimStype')
         self.assertEqual(row_index, 0)
@@ -753,15 +770,9 @@ class SequentialRecordingsTableTests(ICEphysMetaTestBase):
 
     def test_enforce_unique_id(self):
         """
-        Test to ensure that unique ids are enforced on RepetitionsTable table
+        Test to ensure that unique ids are enforced on SequentialRecordingsTable table
         """
-        ir = IntracellularRecordingsTable()
-        ir.add_recording(electrode=self.electrode,
-                         stimulus=self.stimulus,
-                         response=self.response,
-                         id=np.int64(10))
-        sw = SimultaneousRecordingsTable(intracellular_recordings_table=ir)
-        sw.add_simultaneous_recording(recordings=[0])
+        sw = self.create_table_hierarchy(2)[-1]
         sws = SequentialRecordingsTable(sw)
         sws.add_sequential_recording(simultaneous_recordings=[0, ], id=np.int64(10), stimulus_type='MyStimStype')
         with self.assertRaises(ValueError):
@@ -796,35 +807,17 @@ class RepetitionsTableTests(ICEphysMetaTestBase):
         """
         Populate, write, and read the RepetitionsTable container and other required containers
         """
-        ir = IntracellularRecordingsTable()
-        row_index = ir.add_recording(electrode=self.electrode,
-                                     stimulus=self.stimulus,
-                                     response=self.response,
-                                     id=np.int64(10))
-        self.assertEqual(row_index, 0)
-        sw = SimultaneousRecordingsTable(intracellular_recordings_table=ir)
-        row_index = sw.add_simultaneous_recording(recordings=[0])
-        self.assertEqual(row_index, 0)
-        sws = SequentialRecordingsTable(sw)
-        row_index = sws.add_sequential_recording(simultaneous_recordings=[0, ], stimulus_type='MyStimStype')
-        self.assertEqual(row_index, 0)
+        ir, sw, sws = self.create_table_hierarchy(3)
         repetitions = RepetitionsTable(sequential_recordings_table=sws)
-        repetitions.add_repetition(sequential_recordings=[0, ])
+        row_index = repetitions.add_repetition(sequential_recordings=[0, ])
+        self.assertEqual(row_index, 0)
         self.write_test_helper(ir=ir, sw=sw, sws=sws, repetitions=repetitions)
 
     def test_enforce_unique_id(self):
         """
         Test to ensure that unique ids are enforced on RepetitionsTable table
         """
-        ir = IntracellularRecordingsTable()
-        ir.add_recording(electrode=self.electrode,
-                         stimulus=self.stimulus,
-                         response=self.response,
-                         id=np.int64(10))
-        sw = SimultaneousRecordingsTable(intracellular_recordings_table=ir)
-        sw.add_simultaneous_recording(recordings=[0])
-        sws = SequentialRecordingsTable(sw)
-        sws.add_sequential_recording(simultaneous_recordings=[0, ], stimulus_type='MyStimStype')
+        sws = self.create_table_hierarchy(3)[-1]
         repetitions = RepetitionsTable(sequential_recordings_table=sws)
         repetitions.add_repetition(sequential_recordings=[0, ], id=np.int64(10))
         with self.assertRaises(ValueError):
@@ -860,21 +853,7 @@ class ExperimentalConditionsTableTests(ICEphysMetaTestBase):
         """
         Populate, write, and read the ExperimentalConditionsTable container and other required containers
         """
-        ir = IntracellularRecordingsTable()
-        row_index = ir.add_recording(electrode=self.electrode,
-                                     stimulus=self.stimulus,
-                                     response=self.response,
-                                     id=np.int64(10))
-        self.assertEqual(row_index, 0)
-        sw = SimultaneousRecordingsTable(intracellular_recordings_table=ir)
-        row_index = sw.add_simultaneous_recording(recordings=[0])
-        self.assertEqual(row_index, 0)
-        sws = SequentialRecordingsTable(sw)
-        row_index = sws.add_sequential_recording(simultaneous_recordings=[0, ], stimulus_type='MyStimStype')
-        self.assertEqual(row_index, 0)
-        repetitions = RepetitionsTable(sequential_recordings_table=sws)
-        row_index = repetitions.add_repetition(sequential_recordings=[0, ])
-        self.assertEqual(row_index, 0)
+        ir, sw, sws, repetitions = self.create_table_hierarchy(4)
         cond = ExperimentalConditionsTable(repetitions_table=repetitions)
         row_index = cond.add_experimental_condition(repetitions=[0, ])
         self.assertEqual(row_index, 0)
@@ -882,19 +861,9 @@ class ExperimentalConditionsTableTests(ICEphysMetaTestBase):
 
     def test_enforce_unique_id(self):
         """
-        Test to ensure that unique ids are enforced on RepetitionsTable table
+        Test to ensure that unique ids are enforced on ExperimentalConditionsTable table
         """
-        ir = IntracellularRecordingsTable()
-        ir.add_recording(electrode=self.electrode,
-                         stimulus=self.stimulus,
-                         response=self.response,
-                         id=np.int64(10))
-        sw = SimultaneousRecordingsTable(intracellular_recordings_table=ir)
-        sw.add_simultaneous_recording(recordings=[0])
-        sws = SequentialRecordingsTable(sw)
-        sws.add_sequential_recording(simultaneous_recordings=[0, ], stimulus_type='MyStimStype')
-        repetitions = RepetitionsTable(sequential_recordings_table=sws)
-        repetitions.add_repetition(sequential_recordings=[0, ])
+        repetitions = self.create_table_hierarchy(4)[-1]
         cond = ExperimentalConditionsTable(repetitions_table=repetitions)
         cond.add_experimental_condition(repetitions=[0, ], id=np.int64(10))
         with self.assertRaises(ValueError):
@@ -905,13 +874,6 @@ class ICEphysFileTests(unittest.TestCase):
     """
     Test class for testing the ICEphysFileTests Container class
     """
-    def setUp(self):
-        warnings.simplefilter("always")  # Trigger all warnings
-        self.path = 'test_icephys_meta_intracellularrecording.h5'
-
-    def tearDown(self):
-        remove_test_file(self.path)
-
     def __get_icephysfile(self):
         """
         Create a dummy ICEphysFile instance
@@ -919,7 +881,7 @@ class ICEphysFileTests(unittest.TestCase):
         icefile = ICEphysFile(
             session_description='my first synthetic recording',
             identifier='EXAMPLE_ID',
-            session_start_time=datetime.now(tzlocal()),
+            session_start_time=_SESSION_START_TIME,
             experimenter='Dr. Bilbo Baggins',
             lab='Bag End Laboratory',
             institution='University of Middle Earth at the Shire',
@@ -941,12 +903,12 @@ class ICEphysFileTests(unittest.TestCase):
         """
         return VoltageClampStimulusSeries(
             name="ccss",
-            data=[1, 2, 3, 4, 5],
+            data=_STIMULUS_DATA,
             starting_time=123.6,
             rate=10e3,
             electrode=electrode,
             gain=0.02,
-            sweep_number=np.uint64(15))
+            sweep_number=_SWEEP_NUMBER)
 
     def __get_response(self, electrode):
         """
@@ -954,7 +916,7 @@ class ICEphysFileTests(unittest.TestCase):
         """
         return VoltageClampSeries(
             name='vcs',
-            data=[0.1, 0.2, 0.3, 0.4, 0.5],
+            data=_RESPONSE_DATA,
             conversion=1e-12,
             resolution=np.nan,
             starting_time=123.6,
@@ -963,7 +925,7 @@ class ICEphysFileTests(unittest.TestCase):
             gain=0.02,
             capacitance_slow=100e-12,
             resistance_comp_correction=70.0,
-            sweep_number=np.uint64(15))
+            sweep_number=_SWEEP_NUMBER)
 
     def test_init(self):
         """
@@ -1001,21 +963,22 @@ class ICEphysFileTests(unittest.TestCase):
             device=nwbfile.create_device(name='Heka ITC-1600'))
         local_stimulus = VoltageClampStimulusSeries(
             name="ccss",
-            data=[1, 2, 3, 4, 5],
+            data=_STIMULUS_DATA,
             starting_time=123.6,
             rate=10e3,
             electrode=local_electrode,
             gain=0.02,
-            sweep_number=np.uint64(15))
+            sweep_number=_SWEEP_NUMBER)
         local_stimulus2 = VoltageClampStimulusSeries(
             name="ccss2",
-            data=[1, 2, 3, 4, 5],
+            data=_STIMULUS_DATA,
             starting_time=123.6,
             rate=10e3,
             electrode=local_electrode,
             gain=0.02,
-            sweep_number=np.uint64(15))
+            sweep_number=_SWEEP_NUMBER)
         with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")  # Trigger all warnings
             nwbfile.add_stimulus_template(local_stimulus, use_sweep_table=True)
             self.assertEqual(len(w), 1)
             assert issubclass(w[-1].category, DeprecationWarning)
@@ -1039,6 +1002,7 @@ class ICEphysFileTests(unittest.TestCase):
         responce = self.__get_response(electrode=electrode)
         # Make sure we warn if sweeptable is added on add_stimulus
         with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")  # Trigger all warnings
             nwbfile.add_acquisition(responce, use_sweep_table=True)
             self.assertEqual(len(w), 1)
             assert issubclass(w[-1].category, DeprecationWarning)
@@ -1055,12 +1019,12 @@ class ICEphysFileTests(unittest.TestCase):
         """
         Test that warnings are raised if the user tries to use a sweeps table
         """
-        from pynwb.icephys import SweepTable
         with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")  # Trigger all warnings
             nwbfile = ICEphysFile(
                 session_description='my first synthetic recording',
                 identifier='EXAMPLE_ID',
-                session_start_time=datetime.now(tzlocal()),
+                session_start_time=_SESSION_START_TIME,
                 experimenter='Dr. Bilbo Baggins',
                 lab='Bag End Laboratory',
                 institution='University of Middle Earth at the Shire',
@@ -1078,10 +1042,11 @@ class ICEphysFileTests(unittest.TestCase):
 
     def test_deprectation_ic_filtering_on_init(self):
         with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")  # Trigger all warnings
             nwbfile = ICEphysFile(
                 session_description='my first synthetic recording',
                 identifier='EXAMPLE_ID',
-                session_start_time=datetime.now(tzlocal()),
+                session_start_time=_SESSION_START_TIME,
                 experimenter='Dr. Bilbo Baggins',
                 lab='Bag End Laboratory',
                 institution='University of Middle Earth at the Shire',
@@ -1091,12 +1056,13 @@ class ICEphysFileTests(unittest.TestCase):
             assert issubclass(w[-1].category, DeprecationWarning)
             self.assertEqual(nwbfile.ic_filtering, 'test filtering')
 
+    @unittest.skipIf(SKIP_IO_TESTS, "NDX_ICEPHYS_META_SKIP_IO_TESTS is set")
     def test_ic_filtering_roundtrip(self):
         # create the base file
         nwbfile = ICEphysFile(
                 session_description='my first synthetic recording',
                 identifier='EXAMPLE_ID',
-                session_start_time=datetime.now(tzlocal()),
+                session_start_time=_SESSION_START_TIME,
                 experimenter='Dr. Bilbo Baggins',
                 lab='Bag End Laboratory',
                 institution='University of Middle Earth at the Shire',
@@ -1104,17 +1070,20 @@ class ICEphysFileTests(unittest.TestCase):
                 session_id='LONELYMTN')
         # set the ic_filtering attribute and make sure we get a deprectation warning
         with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")  # Trigger all warnings
             nwbfile.ic_filtering = 'test filtering'
             assert issubclass(w[-1].category, DeprecationWarning)
-        # write the test fil
-        with NWBHDF5IO(self.path, 'w') as io:
-            io.write(nwbfile)
-        # read the test file and confirm ic_filtering has been written
-        with NWBHDF5IO(self.path, 'r') as io:
-            with warnings.catch_warnings(record=True) as w:
-                infile = io.read()
-                assert issubclass(w[-1].category, DeprecationWarning)
-                self.assertEqual(infile.ic_filtering, 'test filtering')
+        # write the test file in memory (see ICEphysMetaTestBase.write_test_helper)
+        with BytesIO() as buffer:
+            with h5py.File(buffer, 'w') as h5file, NWBHDF5IO(mode='w', file=h5file) as io:
+                io.write(nwbfile)
+            # read the test file and confirm ic_filtering has been written
+            with h5py.File(buffer, 'r') as h5file, NWBHDF5IO(mode='r', file=h5file) as io:
+                with warnings.catch_warnings(record=True) as w:
+                    warnings.simplefilter("always")  # Trigger all warnings
+                    infile = io.read()
+                    assert issubclass(w[-1].category, DeprecationWarning)
+                    self.assertEqual(infile.ic_filtering, 'test filtering')
 
     def test_get_icephys_meta_parent_table(self):
         """
@@ -1124,7 +1093,7 @@ class ICEphysFileTests(unittest.TestCase):
         local_nwbfile = ICEphysFile(
                 session_description='my first synthetic recording',
                 identifier='EXAMPLE_ID',
-                session_start_time=datetime.now(tzlocal()),
+                session_start_time=_SESSION_START_TIME,
                 experimenter='Dr. Bilbo Baggins',
                 lab='Bag End Laboratory',
                 institution='University of Middle Earth at the Shire',
@@ -1137,14 +1106,14 @@ class ICEphysFileTests(unittest.TestCase):
             description='a mock intracellular electrode',
             device=local_device)
         local_stimulus = VoltageClampStimulusSeries(name="ccss",
-                                                    data=[1, 2, 3, 4, 5],
+                                                    data=_STIMULUS_DATA,
                                                     starting_time=123.6,
                                                     rate=10e3,
                                                     electrode=local_electrode,
                                                     gain=0.02,
-                                                    sweep_number=np.uint64(15))
+                                                    sweep_number=_SWEEP_NUMBER)
         local_response = VoltageClampSeries(name='vcs',
-                                            data=[0.1, 0.2, 0.3, 0.4, 0.5],
+                                            data=_RESPONSE_DATA,
                                             conversion=1e-12,
                                             resolution=np.nan,
                                             starting_time=123.6,
@@ -1153,7 +1122,7 @@ class ICEphysFileTests(unittest.TestCase):
                                             gain=0.02,
                                             capacitance_slow=100e-12,
                                             resistance_comp_correction=70.0,
-                                            sweep_number=np.uint64(15))
+                                            sweep_number=_SWEEP_NUMBER)
         local_nwbfile.add_stimulus_template(local_stimulus)
         # Check that none of the table exist yet
         self.assertIsNone(local_nwbfile.get_icephys_meta_parent_table())
@@ -1301,11 +1270,14 @@ class ICEphysFileTests(unittest.TestCase):
         self.assertEqual(len(res['repetitions_id']), 1)
 
         #############################################
-        #  Test writing the file to disk
+        #  Test writing the file
         #############################################
-        # Write our file to disk
-        # Write our test file
-        with NWBHDF5IO(self.path, 'w') as nwbio:
+        # The file has been checked in memory above. Skip only the HDF5 round trip
+        if SKIP_IO_TESTS:
+            return
+        # Write our test file to an HDF5 file held in memory by a BytesIO buffer
+        buffer = BytesIO()
+        with h5py.File(buffer, 'w') as h5file, NWBHDF5IO(mode='w', file=h5file) as nwbio:
             # # Uncomment the following lines to enable profiling for write
             # import cProfile, pstats, io
             # from pstats import SortKey
@@ -1323,36 +1295,21 @@ class ICEphysFileTests(unittest.TestCase):
         # Confirm that the low-level data has been written as expected
         # before we try to read the file back
         #################################################################
-        with h5py.File(self.path, 'r') as io:
-            self.assertTupleEqual(
-                io['/general']['intracellular_ephys']['intracellular_recordings']['id'].shape,
-                (1,))
-            self.assertTupleEqual(
-                io['/general']['intracellular_ephys']['intracellular_recordings']['electrodes']['id'].shape,
-                (1,))
-            self.assertTupleEqual(
-                io['/general']['intracellular_ephys']['intracellular_recordings']['stimuli']['id'].shape,
-                (1,))
-            self.assertTupleEqual(
-                io['/general']['intracellular_ephys']['intracellular_recordings']['responses']['id'].shape,
-                (1,))
-            self.assertTupleEqual(
-                io['/general']['intracellular_ephys']['simultaneous_recordings']['id'].shape,
-                (1,))
-            self.assertTupleEqual(
-                io['/general']['intracellular_ephys']['sequential_recordings']['id'].shape,
-                (1,))
-            self.assertTupleEqual(
-                io['/general']['intracellular_ephys']['repetitions']['id'].shape,
-                (1,))
-            self.assertTupleEqual(
-                io['/general']['intracellular_ephys']['experimental_conditions']['id'].shape,
-                (1,))
+        with h5py.File(buffer, 'r') as h5file:
+            icephys_group = h5file['/general/intracellular_ephys']
+            self.assertTupleEqual(icephys_group['intracellular_recordings/id'].shape, (1,))
+            self.assertTupleEqual(icephys_group['intracellular_recordings/electrodes/id'].shape, (1,))
+            self.assertTupleEqual(icephys_group['intracellular_recordings/stimuli/id'].shape, (1,))
+            self.assertTupleEqual(icephys_group['intracellular_recordings/responses/id'].shape, (1,))
+            self.assertTupleEqual(icephys_group['simultaneous_recordings/id'].shape, (1,))
+            self.assertTupleEqual(icephys_group['sequential_recordings/id'].shape, (1,))
+            self.assertTupleEqual(icephys_group['repetitions/id'].shape, (1,))
+            self.assertTupleEqual(icephys_group['experimental_conditions/id'].shape, (1,))
 
         #############################################
-        #  Test reading the file back from disk
+        #  Test reading the file back
         #############################################
-        with NWBHDF5IO(self.path, 'r') as nwbio:
+        with h5py.File(buffer, 'r') as h5file, NWBHDF5IO(mode='r', file=h5file) as nwbio:
             # # Uncomment the following lines to enable profiling for read
             # import cProfile, pstats, io
             # from pstats import SortKey